@@ -3,26 +3,29 @@ import sys
 import json
 
 from dotenv import load_dotenv
+from pathlib import Path
 from typing import Callable
 
 from langchain.llms import GPT4All
-from langchain.vectorstores import Chroma
-from langchain.callbacks import StdOutCallbackHandler
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.memory import ConversationBufferMemory
+from langchain.vectorstores import Chroma, FAISS
+from langchain.vectorstores.base import VectorStore
+from langchain.callbacks import StreamingStdOutCallbackHandler
+from langchain.memory import ConversationSummaryBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 
 from langchain.vectorstores.base import VectorStoreRetriever
 
 from src.ingest import Ingestor
+from src.embeddings_cache import get_embeddings_model
+from src.onnx_embeddings import OnnxEmbeddings
 
-from src.constants import CHROMA_SETTINGS
+from src.constants import CHROMA_SETTINGS, COLLECTION_METADATA, COLLECTION_NAME
 
 
 class Eunomia:
     def __init__(self) -> None:
         self.cwd = self.get_cwd()
-        self.db = f"{self.cwd}\{os.environ.get('PERSIST_DIRECTORY')}".strip()
+        self.db = str(Path(self.cwd) / os.environ["PERSIST_DIRECTORY"])
         self.llm = os.environ.get("LLM")
         self.backend = os.environ.get("BACKEND")
         self.embeddings_model = os.environ.get("EMBEDDINGS_MODEL")
@@ -30,6 +33,7 @@ class Eunomia:
 
         self.model_n_ctx = int(os.environ.get("MODEL_N_CTX"))
         self.target_chunks = int(os.environ.get("TARGET_SOURCE_CHUNKS"))
+        self.vectorstore = os.environ.get("VECTORSTORE", "chroma")
 
     def get_cwd(self) -> str:
         current_working_dir = os.getcwd()
@@ -54,7 +58,7 @@ class Eunomia:
         """
         Initializes the necessary components for the LLM to start. This function uses the following components:
 
-        - HuggingFace embeddings for NLP processing using the specified `model_name`
+        - Quantized ONNX embeddings for NLP processing using the specified `model_name`
         - Chroma for retrieving and storing the embeddings
         - GPT4All language model for conversational responses
         - Conversational retrieval chain for generating responses
@@ -66,8 +70,15 @@ class Eunomia:
         - None
         """
         embeddings = self._initialize_embeddings(self.embeddings_model)
-        chroma = self._initialize_chroma(self.db, embeddings)
-        retriever = self._initialize_retriever(chroma, self.target_chunks)
+        if self.vectorstore == "faiss":
+            # The index is always written by our own ingest run, so loading
+            # its pickle is safe
+            store = FAISS.load_local(
+                self.db, embeddings, allow_dangerous_deserialization=True
+            )
+        else:
+            store = self._initialize_chroma(self.db, embeddings)
+        retriever = self._initialize_retriever(store, self.target_chunks)
         llm = self._initialize_llm(self.llm, self.model_n_ctx, self.backend)
 
         qa = self._initialize_qa(llm, retriever)
@@ -89,17 +100,17 @@ class Eunomia:
 
             response = qa({"question": query})
 
-    def _initialize_embeddings(self, model_name: str) -> HuggingFaceEmbeddings:
+    def _initialize_embeddings(self, model_name: str) -> OnnxEmbeddings:
         """
-        Initializes HuggingFaceEmbeddings with the specified model name.
+        Initializes the quantized ONNX embeddings with the specified model name.
 
         :param model_name: A string representing the name of the model to use for embedding initialization.
         :type model_name: str
 
-        :return: An instance of HuggingFaceEmbeddings initialized with the specified model name.
-        :rtype: HuggingFaceEmbeddings
+        :return: A cached instance of OnnxEmbeddings for the specified model name.
+        :rtype: OnnxEmbeddings
         """
-        return HuggingFaceEmbeddings(model_name=model_name)
+        return get_embeddings_model(model_name)
 
     def _initialize_chroma(
         self, persist_directory: str, embedding_function: Callable
@@ -113,50 +124,61 @@ class Eunomia:
         :return: A Chroma object.
         """
         return Chroma(
+            collection_name=COLLECTION_NAME,
             persist_directory=persist_directory,
             embedding_function=embedding_function,
             client_settings=CHROMA_SETTINGS,
+            collection_metadata=COLLECTION_METADATA,
         )
 
     def _initialize_retriever(
-        self, chroma: Chroma, target_chunks: int
+        self, store: VectorStore, target_chunks: int
     ) -> VectorStoreRetriever:
         """
         Initializes a retriever object to initialize the ConversationalRetrievealChain instance.
 
-        :param chroma: A Chroma instance to be used to initialize the ConversationalRetrievalChain.
-        :type chroma: Chroma
+        :param store: The vectorstore (Chroma or FAISS) to retrieve from.
+        :type store: VectorStore
 
         :param target_chunks: The target number of chunks.
         :type target_chunks: int
 
         :return: A VectorStoreRetriever object.
         """
-        return chroma.as_retriever(
+        return store.as_retriever(
+            search_type="mmr",
             search_kwargs={
                 "k": target_chunks,
                 "fetch_k": 20,
-                "maximal_marginal_relevance": True,
-            }
+                "lambda_mult": 0.5,
+            },
         )
 
-    def _initialize_llm(self, model: str, n_ctx: int, backend: str) -> GPT4All:
+    def _initialize_llm(
+        self, model: str, n_ctx: int, backend: str, streaming: bool = True
+    ) -> GPT4All:
         """
         Initializes a GPT4All model with the given parameters.
 
         :param model: The name of the GPT4All model to use.
         :param n_ctx: The size of the input context for the model.
         :param backend: The backend to use for the model.
+        :param streaming: Whether generated tokens should stream to stdout.
 
         :return: The initialized GPT4All model.
         """
+        n_threads = int(os.environ.get("N_THREADS", os.cpu_count()))
+        n_batch = int(os.environ.get("N_BATCH", 512))
+
         return GPT4All(
             model=model,
-            n_ctx=n_ctx,
+            max_tokens=n_ctx,
             backend=backend,
             verbose=True,
-            callbacks=[StdOutCallbackHandler()],
-            n_threads=8,
+            streaming=streaming,
+            callbacks=[StreamingStdOutCallbackHandler()] if streaming else [],
+            n_threads=n_threads,
+            n_batch=n_batch,
             temp=0.5,
         )
 
@@ -174,12 +196,31 @@ class Eunomia:
         :return: A new ConversationalRetrievalChain object created from the GPT4All model and ConversationalRetrievalChain object.
         :rtype: ConversationalRetrievalChain
         """
-        memory = ConversationBufferMemory(
-            memory_key="chat_history", return_messages=True
+        memory = ConversationSummaryBufferMemory(
+            llm=llm,
+            memory_key="chat_history",
+            return_messages=True,
+            max_token_limit=512,
+        )
+
+        # A smaller model can rewrite follow-up questions much faster than the
+        # answering model; the chain already skips condensing while the chat
+        # history is empty.
+        condense_model = os.environ.get("CONDENSE_LLM")
+        condense_llm = (
+            self._initialize_llm(
+                condense_model, self.model_n_ctx, self.backend, streaming=False
+            )
+            if condense_model
+            else llm
         )
 
         return ConversationalRetrievalChain.from_llm(
-            llm, retriever=retriever, memory=memory
+            llm,
+            retriever=retriever,
+            memory=memory,
+            condense_question_llm=condense_llm,
+            return_source_documents=False,
         )
 
 
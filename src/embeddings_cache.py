@@ -0,0 +1,20 @@
+from functools import lru_cache
+
+from src.onnx_embeddings import OnnxEmbeddings
+
+
+@lru_cache(maxsize=2)
+def get_embeddings_model(model_name: str) -> OnnxEmbeddings:
+    """
+    Returns a process-level cached OnnxEmbeddings instance for the given model
+    name. Loading the encoder takes seconds and allocates a full set of weights,
+    so ingestion and the query loop share one instance instead of each paying
+    the cold-load cost.
+
+    :param model_name: The name of the model to load.
+    :type model_name: str
+
+    :return: A cached OnnxEmbeddings instance.
+    :rtype: OnnxEmbeddings
+    """
+    return OnnxEmbeddings(model_name)
@@ -1,18 +1,76 @@
 import os
-import glob
+import mmap
+import uuid
+import asyncio
+import aiofiles
+import chromadb
+import tempfile
 import concurrent.futures
 
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 from tqdm import tqdm
+from pathlib import Path
+from functools import lru_cache
+from collections import defaultdict
 
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+
+from chromadb.api.models.Collection import Collection
+
+from src.embeddings_cache import get_embeddings_model
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.vectorstores import FAISS
+from langchain.vectorstores.utils import DistanceStrategy
 from langchain.docstore.document import Document
 
-from src.constants import CHROMA_SETTINGS, LOADER_MAPPING, LANG_MAPPINGS
+from src.constants import (
+    CHROMA_SETTINGS,
+    COLLECTION_METADATA,
+    COLLECTION_NAME,
+    CPU_HEAVY_EXTS,
+    LOADER_MAPPING,
+    LANG_MAPPINGS,
+    SUPPORTED_EXTS,
+)
+
+
+@lru_cache(maxsize=None)
+def _get_splitter(
+    emb_model: str, language: Optional[str], chunk_size: int, chunk_overlap: int
+) -> RecursiveCharacterTextSplitter:
+    """
+    Returns a cached text splitter for a language, or a generic splitter when
+    the language is None (extensions with a loader but no language mapping).
+    Splitter construction compiles the language's separator regexes and loads
+    the tokenizer-backed length function, so each (model, language) pair is
+    built exactly once per process instead of once per split call.
+
+    :param emb_model: The embedding model whose tokenizer measures chunk sizes.
+    :type emb_model: str
+    :param language: The language whose separators the splitter breaks on, or
+                     None for the generic separators.
+    :type language: Optional[str]
+    :param chunk_size: The maximum chunk size in tokens.
+    :type chunk_size: int
+    :param chunk_overlap: The overlap between consecutive chunks in tokens.
+    :type chunk_overlap: int
+
+    :return: A cached RecursiveCharacterTextSplitter for the language.
+    :rtype: RecursiveCharacterTextSplitter
+    """
+    tokenizer = get_embeddings_model(emb_model).tokenizer
+    separators = (
+        RecursiveCharacterTextSplitter.get_separators_for_language(language)
+        if language is not None
+        else None
+    )
+    return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators,
+    )
 
 
 class Ingestor:
@@ -25,201 +83,547 @@ class Ingestor:
     ) -> None:
         self.cwd = cwd
         self.db = db
+        self._db_path = Path(db)
         self.emb_model = emb_model
-        self.ignore_folders = ignore_folders
+        self.ignore_folders = set(ignore_folders)
+        self.vectorstore = os.environ.get("VECTORSTORE", "chroma")
 
-        self.chunk_size = 60
-        self.chunk_overlap = 2
+        self.chunk_size = 256
+        self.chunk_overlap = 16
+        self.add_batch_size = 5000
 
-        self.threshold = 5242880  # 5 MB in bytes
+        self._vectorstore_exists = None
 
-    def load_single_document(self, file_path: str) -> Document:
+    def load_single_document(
+        self, file_path: str, mtime: Optional[float] = None
+    ) -> Document:
         """
         Load a single document from a file path using a loader based on the file extension.
 
         :param file_path: A string representing the path to the file to be loaded.
         :type file_path: str
+        :param mtime: The file's modification time recorded during the directory
+                      scan; when omitted the file is stat'd again.
+        :type mtime: Optional[float]
         :return: A Document object representing the loaded document.
         :rtype: Document
         :raises ValueError: If the file extension is not supported.
         """
-        ext = "." + file_path.rsplit(".", 1)[-1]
+        ext = os.path.splitext(file_path)[1].lower()
         if ext in LOADER_MAPPING:
             loader_class, loader_args = LOADER_MAPPING[ext]
             loader = loader_class(file_path, **loader_args)
-            return loader.load()[0]
+            document = loader.load()[0]
+            document.metadata["mtime"] = (
+                mtime if mtime is not None else os.path.getmtime(file_path)
+            )
+            return document
 
         raise ValueError(f"Unsupported file extension '{ext}'")
 
-    def load_documents(self, ignored_files: List[str] = []) -> List[Document]:
+    def _scan_files(self, path: str) -> Iterator[os.DirEntry]:
+        """
+        Recursively scans a directory in a single pass, yielding entries for
+        files with a supported extension. Ignored folders are pruned by name, so
+        their whole subtree is skipped without the substring matching that used
+        to catch unrelated paths.
+
+        :param path: The directory to scan.
+        :type path: str
+
+        :return: An iterator of DirEntry objects for loadable files.
+        :rtype: Iterator[os.DirEntry]
+        """
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name not in self.ignore_folders:
+                        yield from self._scan_files(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTS:
+                    yield entry
+
+    def load_documents(
+        self, seen_files: Dict[str, float] = {}
+    ) -> List[Tuple[str, float, str]]:
         """
         Loads documents from files in the cwd directory and its subdirectories.
-        Excludes files in specified ignore folders and only loads files that are above
-        a specified file size threshold. Uses multi-processing if file size is above the
-        threshold and multi-threading otherwise.
+        Excludes files in specified ignore folders and files whose modification
+        time matches the one recorded in the vectorstore, so unchanged files are
+        never re-embedded. Plain text files are read concurrently on an asyncio
+        event loop while parse-heavy loaders go to a process pool, so disk reads
+        overlap with parser CPU time. Documents travel through the pipeline as
+        plain (source, mtime, text) tuples; Document objects with their dict
+        overhead are only built per-chunk after splitting.
+
+        :param seen_files: A mapping of already-ingested file paths to the
+                           modification time recorded at ingest time.
+        :type seen_files: Dict[str, float]
 
         Returns:
-            A list of loaded documents.
+            A list of (source, mtime, text) tuples.
         """
-        all_files = []
-        for ext in LOADER_MAPPING:
-            all_files.extend(
-                glob.glob(os.path.join(self.cwd, f"**/*{ext}"), recursive=True)
-            )
+        # Normalize recorded paths so the mtime lookup is not fooled by how the
+        # persist directory or cwd happened to be spelled at ingest time
+        seen = {
+            os.path.abspath(path): mtime for path, mtime in seen_files.items()
+        }
+
+        # Reuse the stat recorded by scandir instead of stat'ing each file again
         filtered_files = []
+        for entry in self._scan_files(self.cwd):
+            mtime = entry.stat(follow_symlinks=False).st_mtime
+            if mtime == seen.get(os.path.abspath(entry.path)):
+                continue
+            filtered_files.append((entry.path, mtime))
 
-        for file_path in all_files:
-            if not any(
-                ignore_folder in file_path for ignore_folder in self.ignore_folders
-            ):
-                filtered_files.append(file_path)
+        results = []
 
-        # Remove files that are already in the vectorstore if it already exists
-        if ignored_files:
-            filtered_files = [
-                file_path for file_path in all_files if file_path not in ignored_files
-            ]
+        max_workers = int(
+            os.environ.get("INGEST_WORKERS", max(1, os.cpu_count() - 1))
+        )
 
-        results = []
+        cpu_heavy = [
+            (file_path, mtime)
+            for file_path, mtime in filtered_files
+            if os.path.splitext(file_path)[1].lower() in CPU_HEAVY_EXTS
+        ]
+        io_bound = [
+            (file_path, mtime)
+            for file_path, mtime in filtered_files
+            if os.path.splitext(file_path)[1].lower() not in CPU_HEAVY_EXTS
+        ]
 
         with tqdm(
             total=len(filtered_files), desc="Loading new documents", ncols=80
         ) as pbar:
-            for file_path in filtered_files:
-                file_size = os.path.getsize(file_path)
-                if file_size > self.threshold:
-                    with ProcessPoolExecutor() as executor:
-                        future = executor.submit(self.load_single_document, file_path)
-                        results.append(future.result())
-                else:
-                    with ThreadPoolExecutor() as executor:
-                        future = executor.submit(self.load_single_document, file_path)
-                        results.append(future.result())
-                pbar.update()
+            with ProcessPoolExecutor(max_workers=max_workers) as process_pool:
+                # Submit the parse-heavy files first so the workers parse while
+                # the event loop streams the plain text reads in this process
+                futures = [
+                    process_pool.submit(self._load_and_spill, file_path, mtime)
+                    for file_path, mtime in cpu_heavy
+                ]
+                if io_bound:
+                    results.extend(asyncio.run(self._read_text_files(io_bound)))
+                    pbar.update(len(io_bound))
+                for future in concurrent.futures.as_completed(futures):
+                    source, mtime, spill_path = future.result()
+                    results.append(
+                        (source, mtime, self._read_spill(spill_path))
+                    )
+                    pbar.update()
 
         return results
 
-    def split_docs(self, docs_list: List[Document], language: str) -> List[Document]:
+    def _load_and_spill(
+        self, file_path: str, mtime: float
+    ) -> Tuple[str, float, str]:
+        """
+        Worker-side wrapper around load_single_document that writes the parsed
+        text to a temp file and returns only its path, so the result pickled
+        back through the process pool's IPC pipe stays a few hundred bytes
+        regardless of document size.
+
+        :param file_path: The path of the file to load.
+        :type file_path: str
+        :param mtime: The file's modification time recorded during the scan.
+        :type mtime: float
+
+        :return: A (source, mtime, spill_path) tuple.
+        :rtype: Tuple[str, float, str]
+        """
+        document = self.load_single_document(file_path, mtime)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf8", suffix=".spill", delete=False
+        ) as handle:
+            handle.write(document.page_content)
+            spill_path = handle.name
+        return (file_path, mtime, spill_path)
+
+    def _read_spill(self, spill_path: str) -> str:
+        """
+        Memory-maps and decodes a worker's spill file, then removes it.
+
+        :param spill_path: The temp file written by _load_and_spill.
+        :type spill_path: str
+
+        :return: The parsed text the worker spilled.
+        :rtype: str
+        """
+        try:
+            with open(spill_path, "rb") as handle:
+                if os.path.getsize(spill_path) == 0:
+                    return ""
+                with mmap.mmap(
+                    handle.fileno(), 0, access=mmap.ACCESS_READ
+                ) as mapped:
+                    return mapped[:].decode("utf8")
+        finally:
+            os.remove(spill_path)
+
+    async def _read_text_files(
+        self, files: List[Tuple[str, float]]
+    ) -> List[Tuple[str, float, str]]:
+        """
+        Reads plain text files concurrently with aiofiles so hundreds of reads
+        overlap on the kernel queue. Their loaders are thin wrappers around
+        open().read(), so LangChain is bypassed here and the raw text is kept
+        as lightweight tuples. A semaphore caps the number of open file handles.
+
+        :param files: The (path, mtime) pairs of the files to read.
+        :type files: List[Tuple[str, float]]
+
+        :return: A list of (source, mtime, text) tuples.
+        :rtype: List[Tuple[str, float, str]]
+        """
+        semaphore = asyncio.Semaphore(64)
+
+        async def read_one(file_path: str, mtime: float) -> Tuple[str, float, str]:
+            async with semaphore:
+                async with aiofiles.open(
+                    file_path, "r", encoding="utf8"
+                ) as handle:
+                    content = await handle.read()
+            return (file_path, mtime, content)
+
+        return list(
+            await asyncio.gather(
+                *(read_one(file_path, mtime) for file_path, mtime in files)
+            )
+        )
+
+    def split_docs(
+        self, docs_list: List[Tuple[str, float, str]], language: Optional[str]
+    ) -> List[Document]:
         """
-        Splits a list of documents into smaller chunks using the RecursiveCharacterTextSplitter
-        object. The function takes a list of Document objects and a language string as
-        parameters. The function returns a List of Document objects.
+        Splits a list of documents into smaller chunks using a splitter that
+        measures chunk sizes with the embedding model's fast tokenizer, so chunk
+        boundaries are token-accurate while still breaking on the language's
+        syntactic separators.
 
-        :param docs_list: The list of Document objects to be split.
-        :type docs_list: List[Document]
-        :param language: The language string to be used by the RecursiveCharacterTextSplitter
-                        object.
-        :type language: str
+        :param docs_list: The (source, mtime, text) tuples to be split.
+        :type docs_list: List[Tuple[str, float, str]]
+        :param language: The language string used to pick the separators for the
+                        splitter, or None for the generic separators.
+        :type language: Optional[str]
         :return: A List of Document objects.
         :rtype: List[Document]
         """
-        text_splitter = RecursiveCharacterTextSplitter.from_language(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            language=language,
+        text_splitter = _get_splitter(
+            self.emb_model, language, self.chunk_size, self.chunk_overlap
         )
-        texts = text_splitter.split_documents(docs_list)
+        texts = []
+        for source, mtime, content in docs_list:
+            for chunk in text_splitter.split_text(content):
+                texts.append(
+                    Document(
+                        page_content=chunk,
+                        metadata={"source": source, "mtime": mtime},
+                    )
+                )
         return texts
 
-    def process_documents(self, ignored_files: List[str] = []) -> List[Document]:
+    def process_documents(
+        self, seen_files: Dict[str, float] = {}
+    ) -> Iterator[List[Document]]:
         """
-        Process documents and split them into smaller chunks of text.
+        Process documents and split them into smaller chunks of text. Splitting
+        is pure CPU work, so language groups fan out across a process pool; the
+        cached splitters are rebuilt once per worker. Chunks are yielded one
+        language group at a time as splitting completes, so the caller can embed
+        and store them incrementally instead of holding every chunk in memory at
+        once.
 
-        :param ignored_files: A list of files to ignore. Default is an empty list.
-        :type ignored_files: List[str]
-        :return: A list of Document objects after splitting them into smaller chunks.
-        :rtype: List[Document]
+        :param seen_files: A mapping of already-ingested file paths to their
+                           recorded modification time. Default is an empty dict.
+        :type seen_files: Dict[str, float]
+        :return: An iterator of chunk batches, one per language group.
+        :rtype: Iterator[List[Document]]
         """
-        doc_dict = {}
         print(f"Loading documents from {self.cwd}")
-        documents = self.load_documents(ignored_files=ignored_files)
+        documents = self.load_documents(seen_files=seen_files)
         if not documents:
             print("No new documents to load")
-            exit(0)
+            return
         print(f"Loaded {len(documents)} new documents from {self.cwd}")
-        with ThreadPoolExecutor() as executor:
-            # Create list of futures for each document split
-            futures = []
-            for doc in documents:
-                ext = doc.metadata["source"].split(".")[-1]
-                if ext not in doc_dict:
-                    doc_dict[ext] = []
-                futures.append(
-                    executor.submit(self.split_docs, [doc], language=LANG_MAPPINGS[ext])
-                )
-            # Gather results from futures as they complete
-            all_docs = []
+
+        # Group documents by language so each splitter is built only once;
+        # extensions without a language mapping fall back to the generic splitter
+        groups = defaultdict(list)
+        for document in documents:
+            ext = os.path.splitext(document[0])[1].lower().lstrip(".")
+            groups[LANG_MAPPINGS.get(ext)].append(document)
+
+        with ProcessPoolExecutor() as executor:
+            # Create one future per language group
+            futures = [
+                executor.submit(self.split_docs, doc_list, language=language)
+                for language, doc_list in groups.items()
+            ]
+            # Yield results from futures as they complete
             for future in concurrent.futures.as_completed(futures):
-                split_docs = future.result()
-                all_docs.extend(split_docs)
-        print(
-            f"Split into {len(all_docs)} chunks of text (max. {self.chunk_size} tokens each)"
-        )
-        return all_docs
+                yield future.result()
 
     def does_vectorstore_exist(self) -> bool:
         """
-        Check if the vectorstore exists by verifying the existence of the index file and
-        the collections and embeddings parquet files.
+        Check if the vectorstore exists. For FAISS this means the serialized
+        index pair is on disk; for Chroma, the SQLite database plus at least one
+        HNSW segment written by a previous ingest. Scans directory entries
+        directly and returns on the first segment file found instead of
+        materializing full glob listings; the result is cached for the lifetime
+        of the ingestor so repeated calls skip the directory scan.
 
         :param self: An instance of the class.
 
         :return: A boolean indicating whether the vectorstore exists or not.
         """
-        index_path = os.path.join(self.db, "index")
-        if os.path.exists(index_path):
-            collections_path = os.path.join(self.db, "chroma-collections.parquet")
-            embeddings_path = os.path.join(self.db, "chroma-embeddings.parquet")
-            if os.path.exists(collections_path) and os.path.exists(embeddings_path):
-                index_files = glob.glob(os.path.join(index_path, "*.bin")) + glob.glob(
-                    os.path.join(index_path, "*.pkl")
-                )
-                # At least 3 documents are needed in a working vectorstore.
-                if len(index_files) > 3:
-                    return True
+        if self._vectorstore_exists is None:
+            self._vectorstore_exists = self._check_vectorstore()
+        return self._vectorstore_exists
+
+    def _check_vectorstore(self) -> bool:
+        """
+        Performs the on-disk check behind does_vectorstore_exist.
+
+        :return: A boolean indicating whether the vectorstore exists or not.
+        """
+        if self.vectorstore == "faiss":
+            return (self._db_path / "index.faiss").exists() and (
+                self._db_path / "index.pkl"
+            ).exists()
+        if not (self._db_path / "chroma.sqlite3").exists():
+            return False
+        with os.scandir(self._db_path) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                with os.scandir(entry.path) as segment_files:
+                    for segment_file in segment_files:
+                        if segment_file.name.endswith(".bin"):
+                            return True
         return False
 
+    def embed_documents(self, collection: Collection, texts: List[Document]) -> None:
+        """
+        Embeds a list of documents in a single batched encode pass and adds them
+        directly to the Chroma collection. Batching the forward pass amortizes the
+        tokenizer overhead instead of embedding chunks one by one through
+        LangChain's per-document loop.
+
+        :param collection: The Chroma collection the embeddings will be added to.
+        :type collection: Collection
+        :param texts: The list of Document objects to embed and store.
+        :type texts: List[Document]
+
+        :return: None
+        """
+        page_contents = [doc.page_content for doc in texts]
+        metadatas = [doc.metadata for doc in texts]
+        ids = [str(uuid.uuid4()) for _ in texts]
+
+        model = get_embeddings_model(self.emb_model)
+        embeddings = model.embed_documents(page_contents)
+
+        for start in range(0, len(texts), self.add_batch_size):
+            end = start + self.add_batch_size
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=page_contents[start:end],
+                metadatas=metadatas[start:end],
+            )
+
+    def _flush(
+        self,
+        collection: Collection,
+        docs: List[Document],
+        seen_sources: set,
+        deleted: set,
+    ) -> None:
+        """
+        Flushes a batch of chunks to the collection. Files being re-ingested
+        have their stale chunks deleted first; the deleted set tracks which
+        sources were already purged so each is only deleted once per run.
+
+        :param collection: The Chroma collection the batch will be added to.
+        :type collection: Collection
+        :param docs: The batch of chunk Documents to embed and store.
+        :type docs: List[Document]
+        :param seen_sources: The sources already present in the vectorstore.
+        :type seen_sources: set
+        :param deleted: The sources whose stale chunks were already removed.
+        :type deleted: set
+
+        :return: None
+        """
+        stale = ({doc.metadata["source"] for doc in docs} & seen_sources) - deleted
+        for source in stale:
+            collection.delete(where={"source": source})
+        deleted |= stale
+
+        self.embed_documents(collection, docs)
+
+    def _ingest_faiss(self) -> None:
+        """
+        Ingests documents into a FAISS index. FAISS appends batches in memory
+        without any per-write persistence cost, so the index is serialized to
+        disk exactly once at the end of the run.
+
+        :return: None
+        """
+        embeddings = get_embeddings_model(self.emb_model)
+
+        db = None
+        seen_files = {}
+        if self.does_vectorstore_exist():
+            print(f"Appending to existing vectorstore at {self.db}")
+            # The index is always written by our own ingest run, so loading
+            # its pickle is safe
+            db = FAISS.load_local(
+                self.db, embeddings, allow_dangerous_deserialization=True
+            )
+            seen_files = {
+                doc.metadata["source"]: doc.metadata.get("mtime")
+                for doc in db.docstore._dict.values()
+            }
+        else:
+            print("Creating new vectorstore")
+
+        seen_sources = set(seen_files)
+        pending = []
+        deleted = set()
+        total_chunks = 0
+        for split_batch in self.process_documents(seen_files):
+            if not total_chunks and not pending:
+                print(f"Creating embeddings. May take some minutes...")
+            pending.extend(split_batch)
+            if len(pending) >= self.add_batch_size:
+                db = self._flush_faiss(db, pending, embeddings, seen_sources, deleted)
+                total_chunks += len(pending)
+                pending = []
+        if pending:
+            db = self._flush_faiss(db, pending, embeddings, seen_sources, deleted)
+            total_chunks += len(pending)
+
+        if not total_chunks:
+            return
+
+        db.save_local(self.db)
+        print(
+            f"Stored {total_chunks} chunks of text (max. {self.chunk_size} tokens each)"
+        )
+
+    def _flush_faiss(
+        self,
+        db,
+        docs: List[Document],
+        embeddings,
+        seen_sources: set,
+        deleted: set,
+    ) -> FAISS:
+        """
+        Adds a batch of chunks to the FAISS index, creating it from the first
+        batch when no index exists yet. Files being re-ingested have their
+        stale chunks deleted from the index first, mirroring the Chroma path;
+        the deleted set tracks which sources were already purged so each is
+        only deleted once per run. The index uses inner product, which
+        matches cosine ranking since the embeddings arrive L2-normalized.
+
+        :param db: The FAISS index built so far, or None on the first batch.
+        :param docs: The batch of chunk Documents to embed and store.
+        :type docs: List[Document]
+        :param embeddings: The embedding model used to build the index.
+        :param seen_sources: The sources already present in the index.
+        :type seen_sources: set
+        :param deleted: The sources whose stale chunks were already removed.
+        :type deleted: set
+
+        :return: The FAISS index including the new batch.
+        :rtype: FAISS
+        """
+        if db is not None:
+            stale = (
+                {doc.metadata["source"] for doc in docs} & seen_sources
+            ) - deleted
+            if stale:
+                stale_ids = [
+                    doc_id
+                    for doc_id, doc in db.docstore._dict.items()
+                    if doc.metadata["source"] in stale
+                ]
+                db.delete(stale_ids)
+                deleted |= stale
+
+        if db is None:
+            return FAISS.from_documents(
+                docs,
+                embeddings,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+        db.add_documents(docs)
+        return db
+
     def ingest(self) -> None:
         """
-        Ingests documents to create embeddings and store them locally in a vectorstore using Chroma. If the vectorstore
-        already exists, updates and appends to it. If it doesn't exist, creates a new vectorstore. Prints progress
-        messages to the console.
+        Ingests documents to create embeddings and store them locally in a vectorstore using Chroma or FAISS,
+        depending on the configured backend. If the vectorstore already exists, updates and appends to it.
+        If it doesn't exist, creates a new vectorstore. Prints progress messages to the console.
+
+        Persistence happens exactly once per write: the PersistentClient commits
+        each batch through SQLite as it lands, with no explicit persist() call
+        that would re-serialize the whole index, and the FAISS path saves the
+        index to disk once after the final batch.
 
         Parameters:
         None
         Returns:
         None
         """
-        # Create embeddings
-        embeddings = HuggingFaceEmbeddings(model_name=self.emb_model)
+        if self.vectorstore == "faiss":
+            self._ingest_faiss()
+            return
+
+        client = chromadb.PersistentClient(path=self.db, settings=CHROMA_SETTINGS)
+        collection = client.get_or_create_collection(
+            COLLECTION_NAME, metadata=COLLECTION_METADATA
+        )
 
         if self.does_vectorstore_exist():
             # Update and store locally vectorstore
             print(f"Appending to existing vectorstore at {self.db}")
-            db = Chroma(
-                persist_directory=self.db,
-                embedding_function=embeddings,
-                client_settings=CHROMA_SETTINGS,
-            )
-            collection = db.get()
-            texts = self.process_documents(
-                [metadata["source"] for metadata in collection["metadatas"]]
-            )
-            print(f"Creating embeddings. May take some minutes...")
-            db.add_documents(texts)
+            seen_files = {
+                metadata["source"]: metadata.get("mtime")
+                for metadata in collection.get(include=["metadatas"])["metadatas"]
+            }
         else:
             # Create and store locally vectorstore
             print("Creating new vectorstore")
-            texts = self.process_documents()
-            print(f"Creating embeddings. May take some minutes...")
-            db = Chroma.from_documents(
-                texts,
-                embeddings,
-                persist_directory=self.db,
-                client_settings=CHROMA_SETTINGS,
-            )
-        db.persist()
-        db = None
+            seen_files = {}
+
+        # Embed and store chunks in bounded batches so memory is freed between
+        # flushes instead of holding the whole corpus at once
+        seen_sources = set(seen_files)
+        pending = []
+        deleted = set()
+        total_chunks = 0
+        for split_batch in self.process_documents(seen_files):
+            if not total_chunks and not pending:
+                print(f"Creating embeddings. May take some minutes...")
+            pending.extend(split_batch)
+            if len(pending) >= self.add_batch_size:
+                self._flush(collection, pending, seen_sources, deleted)
+                total_chunks += len(pending)
+                pending = []
+        if pending:
+            self._flush(collection, pending, seen_sources, deleted)
+            total_chunks += len(pending)
+
+        if not total_chunks:
+            return
+
+        print(
+            f"Stored {total_chunks} chunks of text (max. {self.chunk_size} tokens each)"
+        )
 
         print(
             f"Vectorstore created, you can now run 'eunomia start' to use the LLM to interact with your code!"